@@ -1,49 +1,65 @@
 #!/usr/bin/python3
 
+import os
 import zipfile
-import json
 import csv
 import pathlib
 
-PASSWORD_ITEMS = []
-PASSWORD_DATA_FILE = '/export.data'
+try:
+    from orjson import loads
+except ImportError:
+    try:
+        from ujson import loads
+    except ImportError:
+        from json import loads
+
+FIELDS = ('Title', 'URL', 'Username', 'Password', 'Notes', 'OTPAuth')
+PASSWORD_DATA_FILE = 'export.data'
 BASE_FILE_NAME = None
 PARENT_DIRECTORY = None
 OUTPUT_DIRECTORY = '/output'
-TMP_DIRECTORY = OUTPUT_DIRECTORY + '/tmp'
+WRITE_BUFFER_SIZE = 1 << 20
 
 
 def extract_1password_file():
     with zipfile.ZipFile(PARENT_DIRECTORY + '/' + BASE_FILE_NAME + '.1pux', 'r') as zip_ref:
-        zip_ref.extractall(PARENT_DIRECTORY + TMP_DIRECTORY)
-
-
-def convert_to_keychain():
-    f = open(PARENT_DIRECTORY + TMP_DIRECTORY + PASSWORD_DATA_FILE)
-    data = json.load(f)
-    f.close()
-    for i in data['accounts'][0]['vaults'][0]['items']:
-        title = i['overview']['title']
-        url = i['overview']['url']
-        username = None
-        password = None
-        if len(i['details']['loginFields']) > 0:
-            for j in i['details']['loginFields']:
-                if 'name' in j and 'value' in j:
-                    if j['name'] == 'username':
-                        username = j['value']
-                    elif j['name'] == 'password':
-                        password = j['value']
-        item = dict({'Title': title, 'URL': url, 'Username': username, 'Password': password})
-        PASSWORD_ITEMS.append(item)
-
-
-def export_as_csv():
-    fields = ['Title', 'URL', 'Username', 'Password', 'Notes', 'OTPAuth']
-    with open(PARENT_DIRECTORY + '/' + OUTPUT_DIRECTORY + '/' + BASE_FILE_NAME + ".csv", 'w') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fields)
-        writer.writeheader()
-        writer.writerows(PASSWORD_ITEMS)
+        if PASSWORD_DATA_FILE not in zip_ref.namelist():
+            return None
+        with zip_ref.open(PASSWORD_DATA_FILE) as f:
+            return loads(f.read())
+
+
+def parse_login_fields(login_fields):
+    try:
+        fields = {j['name']: j['value'] for j in login_fields}
+    except (KeyError, TypeError):
+        fields = {j['name']: j['value'] for j in login_fields if 'name' in j and 'value' in j}
+    return fields.get('username'), fields.get('password')
+
+
+def convert_item(i):
+    overview = i['overview']
+    username, password = parse_login_fields(i['details']['loginFields'])
+    return overview['title'], overview['url'], username, password, None, None
+
+
+def convert_to_keychain(data):
+    items = data['accounts'][0]['vaults'][0]['items']
+    return (convert_item(i) for i in items)
+
+
+def export_as_csv(rows):
+    output_file = PARENT_DIRECTORY + '/' + OUTPUT_DIRECTORY + '/' + BASE_FILE_NAME + ".csv"
+    tmp_file = output_file + '.tmp'
+    try:
+        with open(tmp_file, 'w', buffering=WRITE_BUFFER_SIZE) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(FIELDS)
+            writer.writerows(rows)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, output_file)
 
 
 if __name__ == '__main__':
@@ -58,6 +74,10 @@ if __name__ == '__main__':
 
     PARENT_DIRECTORY = str(pathlib.Path(input_file_name).parent.resolve(True))
     BASE_FILE_NAME = str(pathlib.Path(input_file_name).stem)
-    extract_1password_file()
-    convert_to_keychain()
-    export_as_csv()
+    export_data = extract_1password_file()
+    if export_data is None:
+        print("File does not contain " + PASSWORD_DATA_FILE + ". Please check and try again")
+        exit(-3)
+
+    pathlib.Path(PARENT_DIRECTORY + OUTPUT_DIRECTORY).mkdir(exist_ok=True)
+    export_as_csv(convert_to_keychain(export_data))